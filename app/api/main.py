@@ -1,20 +1,85 @@
+import asyncio
+import hashlib
 import logging
 import os
-from fastapi import FastAPI, HTTPException
+from contextlib import asynccontextmanager
+import orjson
+from cachetools import LRUCache
+from fastapi import FastAPI, HTTPException, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from pydantic import BaseModel, Field
 from typing import Optional, List
 from app.core.recommender import recommend_songs, df
-from app.core.agent import MusicAgent
+from app.core.agent import MusicAgent, strip_think
 
 # Setup logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Micro-batching config: coalesce chat prompts arriving within MAX_WAIT
+# seconds into a single llm.abatch call (up to MAX_BATCH prompts).
+MAX_BATCH = 8
+MAX_WAIT = 0.02  # seconds
+
+# Bounded cache for /recommend results, keyed by (song_name_lower, top_n)
+_reco_cache = LRUCache(maxsize=1024)
+
+_chat_queue: asyncio.Queue = None
+
+async def _chat_batch_worker():
+    """Drain the chat queue and send coalesced prompts to the LLM in one batch."""
+    loop = asyncio.get_running_loop()
+    while True:
+        batch = [await _chat_queue.get()]
+        deadline = loop.time() + MAX_WAIT
+        while len(batch) < MAX_BATCH:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(_chat_queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        try:
+            # return_exceptions so one bad prompt doesn't fail the whole batch;
+            # the shared semaphore keeps GROQ_MAX_CONCURRENCY a global throttle
+            async with music_agent._llm_sem:
+                responses = await music_agent.llm.abatch(
+                    [messages for messages, _ in batch], return_exceptions=True
+                )
+            for (_, future), response in zip(batch, responses):
+                if future.done():
+                    continue
+                if isinstance(response, Exception):
+                    logger.error("Chat batch item failed: %s", response)
+                    future.set_exception(response)
+                else:
+                    future.set_result(strip_think(response.content))
+        except Exception as e:
+            logger.exception("Chat batch failed")
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global _chat_queue, music_agent
+    # One-shot init per worker instead of module-level side effects
+    music_agent = MusicAgent()
+    logger.info("MusicAgent initialized")
+    _chat_queue = asyncio.Queue()
+    batch_task = asyncio.create_task(_chat_batch_worker())
+    logger.info("Chat batch worker started")
+    yield
+    batch_task.cancel()
+
 app = FastAPI(
     title="Music Recommendation API",
     description="API for fetching music recommendations based on lyrics similarity.",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse
 )
 
 # Add CORS middleware to allow Streamlit frontend to make requests
@@ -30,14 +95,20 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Initialize MusicAgent once at startup
-music_agent = MusicAgent()
-logger.info("MusicAgent initialized")
+# Initialized once per worker in lifespan
+music_agent: MusicAgent = None
+
+# Precompute the sorted song list once so /songs is an O(1) lookup
+# returning pre-serialized JSON instead of a pandas scan per request
+_SONGS_SORTED = sorted(df['song'].dropna().unique().tolist())
+_SONGS_PAYLOAD = orjson.dumps({"songs": _SONGS_SORTED, "count": len(_SONGS_SORTED)})
+_SONGS_ETAG = hashlib.blake2b(_SONGS_PAYLOAD, digest_size=8).hexdigest()
+logger.info(f"Precomputed song list: {len(_SONGS_SORTED)} songs")
 
 # Request/Response Models
 class RecommendationRequest(BaseModel):
     song_name: str
-    top_n: int = 5
+    top_n: int = Field(5, ge=1, le=50)
 
 class SongRecommendation(BaseModel):
     artist: str
@@ -66,17 +137,23 @@ def health_check():
     }
 
 @app.post("/recommend", response_model=List[SongRecommendation])
-def get_recommendations(request: RecommendationRequest):
+async def get_recommendations(request: RecommendationRequest):
     """Get song recommendations based on lyrics similarity"""
-    logger.info(f"Received recommendation request for: {request.song_name}")
+    logger.debug("Received recommendation request for: %s", request.song_name)
     try:
-        result_df = recommend_songs(request.song_name, request.top_n)
-        
-        if result_df is None:
+        cache_key = (request.song_name.strip().lower(), request.top_n)
+        if cache_key in _reco_cache:
+            recommendations = _reco_cache[cache_key]
+        else:
+            # Run the CPU-bound similarity lookup off the event loop
+            result_df = await asyncio.to_thread(recommend_songs, request.song_name, request.top_n)
+            # Cache the serializable records (None marks "not found")
+            recommendations = None if result_df is None else result_df.to_dict(orient="records")
+            _reco_cache[cache_key] = recommendations
+
+        if recommendations is None:
             raise HTTPException(status_code=404, detail="Song not found")
-        
-        # Convert to list of dicts
-        recommendations = result_df.to_dict(orient="records")
+
         return recommendations
     except HTTPException:
         raise
@@ -85,28 +162,71 @@ def get_recommendations(request: RecommendationRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/chat", response_model=ChatResponse)
-def chat_with_assistant(request: ChatRequest):
+async def chat_with_assistant(request: ChatRequest):
     """Chat with AI music assistant"""
-    logger.info(f"Received chat message: {request.message}")
+    logger.debug("Received chat message: %s", request.message)
     try:
-        response = music_agent.chat(request.message)
+        if not music_agent.llm:
+            response = await music_agent.chat(request.message)
+            return ChatResponse(response=response)
+
+        messages = await music_agent.build_messages(request.message)
+        if isinstance(messages, str):
+            return ChatResponse(response=messages)
+
+        future = asyncio.get_running_loop().create_future()
+        await _chat_queue.put((messages, future))
+        try:
+            response = await future
+        except Exception as e:
+            # Mirror MusicAgent.chat's graceful fallback instead of a 500
+            logger.exception("Error awaiting batched chat response")
+            response = f"I encountered an error while processing your request: {str(e)}"
         return ChatResponse(response=response)
     except Exception as e:
         logger.error(f"Error during chat: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/chat/stream")
+async def chat_stream(request: ChatRequest):
+    """Stream the assistant reply as Server-Sent Events"""
+    logger.debug("Received streaming chat message: %s", request.message)
+
+    async def event_gen():
+        async for chunk in music_agent.chat_stream(request.message):
+            # SSE framing: each newline inside a chunk becomes its own data line
+            yield "data: " + chunk.replace("\n", "\ndata: ") + "\n\n"
+        yield "data: [DONE]\n\n"
+
+    return StreamingResponse(event_gen(), media_type="text/event-stream")
+
 @app.get("/songs", response_model=SongsListResponse)
-def get_all_songs():
+async def get_all_songs(request: Request):
     """Get list of all available songs for dropdown"""
     logger.info("Fetching all songs")
-    try:
-        songs = sorted(df['song'].dropna().unique().tolist())
-        return SongsListResponse(songs=songs, count=len(songs))
-    except Exception as e:
-        logger.error(f"Error fetching songs: {str(e)}")
-        raise HTTPException(status_code=500, detail=str(e))
+    if request.headers.get("if-none-match") == _SONGS_ETAG:
+        return Response(status_code=304)
+    return Response(
+        content=_SONGS_PAYLOAD,
+        media_type="application/json",
+        headers={"Cache-Control": "public, max-age=3600", "ETag": _SONGS_ETAG}
+    )
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    try:
+        import uvloop  # noqa: F401
+        loop, http = "uvloop", "httptools"
+    except ImportError:
+        # uvloop is unavailable on Windows; fall back to the default loop
+        loop, http = "auto", "auto"
+    uvicorn.run(
+        "app.api.main:app",
+        host="0.0.0.0",
+        port=8000,
+        workers=int(os.getenv("WEB_CONCURRENCY", "4")),
+        loop=loop,
+        http=http,
+        log_level="warning"
+    )
 
@@ -1,3 +1,5 @@
+import asyncio
+import functools
 import os
 import logging
 from dotenv import load_dotenv
@@ -12,17 +14,130 @@ Setup logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-"""Load .env variables"""
-base_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), "../.."))
-dotenv_path = os.path.join(base_dir, ".env")
-if os.path.exists(dotenv_path):
-    load_dotenv(dotenv_path)
-    logger.info(f"Loaded .env from {dotenv_path}")
-else:
-    logger.warning(f".env file not found at {dotenv_path}. Using system environment variables.")
+"""Load .env variables (skipped when the environment is already configured,
+so worker startup avoids the filesystem probe)"""
+if not os.getenv("GROQ_API_KEY"):
+    base_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), "../.."))
+    dotenv_path = os.path.join(base_dir, ".env")
+    if os.path.exists(dotenv_path):
+        load_dotenv(dotenv_path)
+        logger.debug(f"Loaded .env from {dotenv_path}")
+    else:
+        logger.warning(f".env file not found at {dotenv_path}. Using system environment variables.")
 
-logger.info(f"MODEL_NAME from env: {os.getenv('MODEL_NAME')}")
-logger.info(f"GROQ_API_KEY set: {'Yes' if os.getenv('GROQ_API_KEY') else 'No'}")
+logger.debug(f"MODEL_NAME from env: {os.getenv('MODEL_NAME')}")
+logger.debug(f"GROQ_API_KEY set: {'Yes' if os.getenv('GROQ_API_KEY') else 'No'}")
+
+"""Precompiled regex patterns (hot path: run on every chat turn)"""
+_QUOTED_RE = re.compile(r'["\']([^"\']+)["\']')
+_SIMILAR_RE = re.compile(r'similar to (.+?)(?:\?|$|\.)')
+# One scan over the input instead of one str.__contains__ pass per keyword
+_INTENT_RE = re.compile(r'recommend|suggestion|similar|like', re.IGNORECASE)
+
+def strip_think(text: str) -> str:
+    """Remove <think>...</think> spans and collapse blank lines in one pass.
+
+    Uses str.find slicing instead of the old two regex passes, so large
+    responses are walked once with no intermediate full-size string.
+    """
+    parts = []
+    i = 0
+    while i < len(text):
+        start = text.find('<think>', i)
+        if start == -1:
+            parts.append(text[i:])
+            break
+        parts.append(text[i:start])
+        end = text.find('</think>', start + 7)
+        if end == -1:
+            break  # unterminated think block: drop the rest
+        i = end + 8
+    cleaned = ''.join(parts)
+
+    # Collapse runs of blank (or whitespace-only) lines to a single break
+    lines = []
+    pending_blank = False
+    for line in cleaned.split('\n'):
+        if not line.strip():
+            pending_blank = True
+        else:
+            if lines and pending_blank:
+                lines.append('')
+            lines.append(line)
+            pending_blank = False
+    return '\n'.join(lines).strip()
+
+class _ThinkStreamFilter:
+    """Strip <think>...</think> spans from a stream of text chunks.
+
+    Keeps a small rolling buffer so tags split across chunk boundaries
+    are still caught.
+    """
+    _OPEN = '<think>'
+    _CLOSE = '</think>'
+
+    def __init__(self):
+        self._buf = ''
+        self._in_think = False
+
+    def feed(self, chunk: str) -> str:
+        """Consume a chunk and return the text safe to emit so far."""
+        self._buf += chunk
+        out = []
+        while True:
+            if self._in_think:
+                idx = self._buf.find(self._CLOSE)
+                if idx == -1:
+                    # Keep a tail that could be the start of a split closing tag
+                    self._buf = self._buf[-(len(self._CLOSE) - 1):]
+                    break
+                self._buf = self._buf[idx + len(self._CLOSE):]
+                self._in_think = False
+            else:
+                idx = self._buf.find(self._OPEN)
+                if idx == -1:
+                    keep = len(self._OPEN) - 1
+                    if len(self._buf) > keep:
+                        out.append(self._buf[:-keep])
+                        self._buf = self._buf[-keep:]
+                    break
+                out.append(self._buf[:idx])
+                self._buf = self._buf[idx + len(self._OPEN):]
+                self._in_think = True
+        return ''.join(out)
+
+    def flush(self) -> str:
+        """Return any held-back text once the stream is finished."""
+        tail = '' if self._in_think else self._buf
+        self._buf = ''
+        return tail
+
+_RECO_HEADER = "Here are the recommended songs:\n"
+
+@functools.lru_cache(maxsize=1024)
+def _cached_reco_text(song_lower: str, top_n: int) -> str:
+    """Run the recommender and format the bullet list, memoized per song.
+
+    Repeat queries for the same song skip the TF-IDF/cosine lookup entirely.
+    """
+    df = recommend_songs(song_lower, top_n=top_n)
+    if df is None or df.empty:
+        return "Song not found in the database. Please try another song."
+
+    result_str = _RECO_HEADER
+    for _, row in df.iterrows():
+        result_str += f"- {row['song']} by {row['artist']}\n"
+    return result_str
+
+"""Prompt templates, built once at import (template parsing is not free per call)"""
+_FORMAT_TMPL = ChatPromptTemplate.from_messages([
+    ("system", "You are a helpful music assistant. Format the following recommendations in a friendly way."),
+    ("user", "The user asked: {user_input}\n\nRecommendations:\n{recommendations}")
+])
+_GENERAL_TMPL = ChatPromptTemplate.from_messages([
+    ("system", "You are a helpful music assistant. You can recommend songs based on lyrics similarity. Ask the user for a song name if they want recommendations."),
+    ("user", "{input}")
+])
 
 """MusicAgent class"""
 
@@ -33,6 +148,9 @@ class MusicAgent:
         self.model_name = model_name or os.getenv("MODEL_NAME") or "qwen/qwen3-32b"
         self.api_key = api_key or os.getenv("GROQ_API_KEY")
         self.llm = None
+        # Bound concurrent Groq calls so bursts queue locally instead of
+        # storming the provider into rate-limit retries
+        self._llm_sem = asyncio.Semaphore(int(os.getenv("GROQ_MAX_CONCURRENCY", "8")))
         
         """Debug logging"""
         logger.info(f"MusicAgent provider: {self.provider}")
@@ -58,87 +176,74 @@ class MusicAgent:
 
     def _clean_thinking_tags(self, response: str) -> str:
         """Remove <think> tags from LLM response."""
-        # Remove everything between <think> and </think>
-        cleaned = re.sub(r'<think>.*?</think>', '', response, flags=re.DOTALL)
-        # Clean up extra whitespace
-        cleaned = re.sub(r'\n\s*\n', '\n\n', cleaned)
-        return cleaned.strip()
+        return strip_think(response)
 
     def _get_recommendations(self, song_name: str) -> str:
-        """Get top song recommendations."""
+        """Get top song recommendations (cached per normalized song name)."""
         try:
-            logger.info(f"Fetching recommendations for: {song_name}")
-            df = recommend_songs(song_name, top_n=5)
-            if df is None or df.empty:
-                logger.warning(f"No recommendations found for '{song_name}'")
-                return "Song not found in the database. Please try another song."
-
-            result_str = "Here are the recommended songs:\n"
-            for _, row in df.iterrows():
-                result_str += f"- {row['song']} by {row['artist']}\n"
-
-            logger.info(f"Recommendations fetched:\n{result_str}")
+            logger.info("Fetching recommendations for: %s", song_name)
+            result_str = _cached_reco_text(song_name.strip().lower(), 5)
+            logger.debug("Recommendations fetched:\n%s", result_str)
             return result_str
         except Exception as e:
             logger.exception("Error in _get_recommendations")
             return f"Error occurred while fetching recommendations: {str(e)}"
 
-    def _format_with_llm(self, user_input: str, recommendations: str) -> str:
-        """Format recommendations using the LLM."""
-        if not self.llm:
-            logger.error("LLM not initialized. Returning plain text recommendations.")
-            return recommendations
+    async def build_messages(self, user_input: str):
+        """Route user input and build the message list for the LLM call.
 
-        try:
-            prompt = ChatPromptTemplate.from_messages([
-                ("system", "You are a helpful music assistant. Format the following recommendations in a friendly way."),
-                ("user", f"The user asked: {user_input}\n\nRecommendations:\n{recommendations}")
-            ])
-            response = self.llm.invoke(prompt.format_messages())
-            logger.info(f"LLM formatted response: {response.content}")
-            # Clean thinking tags from response
-            cleaned_response = self._clean_thinking_tags(response.content)
-            return cleaned_response
-        except Exception as e:
-            logger.exception("LLM failed to format recommendations")
-            return f"Could not format recommendations using LLM: {str(e)}"
+        Returns a formatted message list ready for `ainvoke`/`abatch`, or a
+        plain string when the request can be answered without an LLM call.
+        """
+        user_lower = user_input.lower()
+
+        """Detect recommendation requests"""
+        if _INTENT_RE.search(user_input):
+            """Case 1: Song in quotes"""
+            quoted = _QUOTED_RE.findall(user_input)
+            if quoted:
+                song_name = quoted[0]
+                logger.info("Detected quoted song name: %s", song_name)
+                recommendations = await asyncio.to_thread(self._get_recommendations, song_name)
+                if not recommendations.startswith(_RECO_HEADER):
+                    """Not-found / error reply: answer directly, no LLM call"""
+                    return recommendations
+                return self._build_format_messages(user_input, recommendations)
 
-    def chat(self, user_input: str) -> str:
+            """Case 2: "similar to X" pattern"""
+            similar_match = _SIMILAR_RE.search(user_lower)
+            if similar_match:
+                song_name = similar_match.group(1).strip()
+                logger.info("Detected 'similar to' song name: %s", song_name)
+                recommendations = await asyncio.to_thread(self._get_recommendations, song_name)
+                if not recommendations.startswith(_RECO_HEADER):
+                    """Not-found / error reply: answer directly, no LLM call"""
+                    return recommendations
+                return self._build_format_messages(user_input, recommendations)
+
+        """General conversation fallback"""
+        return _GENERAL_TMPL.format_messages(input=user_input)
+
+    def _build_format_messages(self, user_input: str, recommendations: str):
+        """Build the messages asking the LLM to format recommendations."""
+        return _FORMAT_TMPL.format_messages(user_input=user_input, recommendations=recommendations)
+
+    async def chat(self, user_input: str) -> str:
         """Process user input and return recommendations or general chat response."""
-        logger.info(f"User input: {user_input}")
+        logger.info("User input: %s", user_input)
 
         if not self.llm:
             logger.error("LLM not initialized. Cannot process user input.")
             return "I'm sorry, I cannot process your request because the Groq API key is missing or invalid."
 
         try:
-            user_lower = user_input.lower()
-
-            """Detect recommendation requests"""
-            if any(word in user_lower for word in ['recommend', 'suggestion', 'similar', 'like']):
-                """Case 1: Song in quotes"""
-                quoted = re.findall(r'["\']([^"\']+)["\']', user_input)
-                if quoted:
-                    song_name = quoted[0]
-                    logger.info(f"Detected quoted song name: {song_name}")
-                    recommendations = self._get_recommendations(song_name)
-                    return self._format_with_llm(user_input, recommendations)
-
-                """Case 2: "similar to X" pattern"""
-                similar_match = re.search(r'similar to (.+?)(?:\?|$|\.)', user_lower)
-                if similar_match:
-                    song_name = similar_match.group(1).strip()
-                    logger.info(f"Detected 'similar to' song name: {song_name}")
-                    recommendations = self._get_recommendations(song_name)
-                    return self._format_with_llm(user_input, recommendations)
-
-            """General conversation fallback"""
-            prompt = ChatPromptTemplate.from_messages([
-                ("system", "You are a helpful music assistant. You can recommend songs based on lyrics similarity. Ask the user for a song name if they want recommendations."),
-                ("user", "{input}")
-            ])
-            response = self.llm.invoke(prompt.format_messages(input=user_input))
-            logger.info(f"LLM general response: {response.content}")
+            messages = await self.build_messages(user_input)
+            if isinstance(messages, str):
+                return messages
+
+            async with self._llm_sem:
+                response = await self.llm.ainvoke(messages)
+            logger.debug("LLM response: %s", response.content)
             # Clean thinking tags from response
             cleaned_response = self._clean_thinking_tags(response.content)
             return cleaned_response
@@ -146,3 +251,32 @@ class MusicAgent:
         except Exception as e:
             logger.exception("Exception occurred in chat()")
             return f"I encountered an error while processing your request: {str(e)}"
+
+    async def chat_stream(self, user_input: str):
+        """Yield the assistant response incrementally as the LLM streams it."""
+        logger.info("User input (stream): %s", user_input)
+
+        if not self.llm:
+            logger.error("LLM not initialized. Cannot process user input.")
+            yield "I'm sorry, I cannot process your request because the Groq API key is missing or invalid."
+            return
+
+        try:
+            messages = await self.build_messages(user_input)
+            if isinstance(messages, str):
+                yield messages
+                return
+
+            think_filter = _ThinkStreamFilter()
+            async with self._llm_sem:
+                async for chunk in self.llm.astream(messages):
+                    text = think_filter.feed(chunk.content)
+                    if text:
+                        yield text
+            tail = think_filter.flush()
+            if tail:
+                yield tail
+
+        except Exception as e:
+            logger.exception("Exception occurred in chat_stream()")
+            yield f"I encountered an error while processing your request: {str(e)}"
@@ -1,6 +1,7 @@
 """recommend.py"""
 import joblib
 import logging
+import numpy as np
 
 # Setup logging
 logging.basicConfig(
@@ -27,23 +28,32 @@ cosine_sim_path = os.path.join(data_dir, 'cosine_sim.pkl')
 logging.info("🔁 Loading data...")
 try:
     df = joblib.load(df_path)
-    cosine_sim = joblib.load(cosine_sim_path)
+    cosine_sim = np.ascontiguousarray(joblib.load(cosine_sim_path))
     logging.info("✅ Data loaded successfully.")
 except Exception as e:
     logging.error("❌ Failed to load required files: %s", str(e))
     raise e
 
+"""Precompute lowercase titles once so lookups skip a full str.lower() pass"""
+_song_lower = df['song'].str.lower()
+
 
 def recommend_songs(song_name, top_n=5):
     logging.info("🎵 Recommending songs for: '%s'", song_name)
-    idx = df[df['song'].str.lower() == song_name.lower()].index
+    if top_n < 1:
+        logging.warning("⚠️ Non-positive top_n requested: %d", top_n)
+        return df[['artist', 'song']].head(0).reset_index(drop=True)
+    idx = df[_song_lower == song_name.lower()].index
     if len(idx) == 0:
         logging.warning("⚠️ Song not found in dataset.")
         return None
     idx = idx[0]
-    sim_scores = list(enumerate(cosine_sim[idx]))
-    sim_scores = sorted(sim_scores, key=lambda x: x[1], reverse=True)[1:top_n + 1]
-    song_indices = [i[0] for i in sim_scores]
+    sim_row = cosine_sim[idx]
+    """Top-k via argpartition: O(N) select instead of sorting the whole row"""
+    k = min(top_n + 1, len(sim_row))
+    candidates = np.argpartition(sim_row, -k)[-k:]
+    candidates = candidates[np.argsort(sim_row[candidates])[::-1]]
+    song_indices = [int(i) for i in candidates if i != idx][:top_n]
     logging.info("✅ Top %d recommendations ready.", top_n)
     """Create DataFrame with clean serial numbers starting from 1"""
     result_df = df[['artist', 'song']].iloc[song_indices].reset_index(drop=True)
@@ -1,8 +1,11 @@
 """
 API Client for communicating with FastAPI backend
 """
-import requests
+import atexit
+import httpx
 import logging
+import orjson
+import os
 from typing import List, Dict, Optional
 
 logger = logging.getLogger(__name__)
@@ -11,127 +14,213 @@ logger = logging.getLogger(__name__)
 API_BASE_URL = "http://localhost:8000"
 TIMEOUT = 30  # seconds
 
+# On-disk cache for the song list + ETag, reused across processes
+_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "vibecheck")
+_SONGS_CACHE_FILE = os.path.join(_CACHE_DIR, "songs.json")
+
 class APIError(Exception):
     """Custom exception for API errors"""
     pass
 
 class APIClient:
     """Client for making requests to the FastAPI backend"""
-    
+
     def __init__(self, base_url: str = API_BASE_URL):
         self.base_url = base_url
+        # Persistent connection-pooled session: reuses the keep-alive
+        # connection for every call instead of a fresh TCP handshake
+        self.session = httpx.Client(
+            base_url=base_url,
+            timeout=TIMEOUT,
+            limits=httpx.Limits(max_keepalive_connections=8)
+        )
+        # Last-seen /songs ETag and payload, for If-None-Match revalidation
+        self._songs_etag: Optional[str] = None
+        self._songs_cache: Optional[List[str]] = None
+        self._load_songs_cache()
+        atexit.register(self.close)
         logger.info(f"APIClient initialized with base URL: {base_url}")
-    
+
+    def close(self):
+        """Close the underlying HTTP session"""
+        if not self.session.is_closed:
+            self.session.close()
+
+    def _load_songs_cache(self):
+        """Load the last-seen song list and ETag from disk, if present"""
+        try:
+            with open(_SONGS_CACHE_FILE, "rb") as f:
+                cached = orjson.loads(f.read())
+            self._songs_etag = cached.get("etag")
+            self._songs_cache = cached.get("songs")
+            logger.info(f"Loaded {len(self._songs_cache or [])} songs from disk cache")
+        except (OSError, ValueError):
+            pass  # no cache yet, or unreadable: fall through to a full fetch
+
+    def _save_songs_cache(self):
+        """Persist the song list and ETag atomically"""
+        try:
+            os.makedirs(_CACHE_DIR, exist_ok=True)
+            tmp_path = _SONGS_CACHE_FILE + ".tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(orjson.dumps({"etag": self._songs_etag, "songs": self._songs_cache}))
+            os.replace(tmp_path, _SONGS_CACHE_FILE)
+        except OSError:
+            logger.warning("Could not persist song-list cache", exc_info=True)
+
     def check_health(self) -> Dict:
         """Check if API is healthy and available"""
         try:
-            response = requests.get(f"{self.base_url}/health", timeout=5)
+            response = self.session.get("/health", timeout=5)
             response.raise_for_status()
             return response.json()
-        except requests.exceptions.ConnectionError:
+        except httpx.ConnectError:
             raise APIError("Cannot connect to API server. Is FastAPI running on port 8000?")
-        except requests.exceptions.Timeout:
+        except httpx.TimeoutException:
             raise APIError("API health check timed out")
         except Exception as e:
             raise APIError(f"Health check failed: {str(e)}")
-    
+
     def get_recommendations(self, song_name: str, top_n: int = 5) -> List[Dict]:
         """
         Get song recommendations
-        
+
         Args:
             song_name: Name of the song
             top_n: Number of recommendations to return
-            
+
         Returns:
             List of recommendations with 'artist' and 'song' fields
-            
+
         Raises:
             APIError: If API request fails
         """
         try:
             logger.info(f"Requesting recommendations for: {song_name}")
-            response = requests.post(
-                f"{self.base_url}/recommend",
-                json={"song_name": song_name, "top_n": top_n},
-                timeout=TIMEOUT
+            response = self.session.post(
+                "/recommend",
+                json={"song_name": song_name, "top_n": top_n}
             )
-            
+
             if response.status_code == 404:
                 return None  # Song not found
-            
+
             response.raise_for_status()
             recommendations = response.json()
             logger.info(f"Received {len(recommendations)} recommendations")
             return recommendations
-            
-        except requests.exceptions.ConnectionError:
+
+        except httpx.ConnectError:
             raise APIError("Cannot connect to API server. Please start FastAPI first.")
-        except requests.exceptions.Timeout:
+        except httpx.TimeoutException:
             raise APIError("Request timed out. The server might be overloaded.")
-        except requests.exceptions.HTTPError as e:
+        except httpx.HTTPStatusError as e:
             if e.response.status_code == 404:
                 return None
             raise APIError(f"API returned error: {e.response.status_code}")
         except Exception as e:
             raise APIError(f"Unexpected error: {str(e)}")
-    
+
     def chat_with_assistant(self, message: str) -> str:
         """
         Chat with AI music assistant
-        
+
         Args:
             message: User message
-            
+
         Returns:
             Assistant's response
-            
+
         Raises:
             APIError: If API request fails
         """
         try:
             logger.info(f"Sending chat message: {message[:50]}...")
-            response = requests.post(
-                f"{self.base_url}/chat",
-                json={"message": message},
-                timeout=TIMEOUT
+            response = self.session.post(
+                "/chat",
+                json={"message": message}
             )
             response.raise_for_status()
             result = response.json()
             return result.get("response", "No response received")
-            
-        except requests.exceptions.ConnectionError:
+
+        except httpx.ConnectError:
+            raise APIError("Cannot connect to API server. Please start FastAPI first.")
+        except httpx.TimeoutException:
+            raise APIError("Chat request timed out. Please try again.")
+        except Exception as e:
+            raise APIError(f"Chat error: {str(e)}")
+
+    def stream_chat(self, message: str):
+        """
+        Stream the assistant's reply chunk by chunk
+
+        Args:
+            message: User message
+
+        Yields:
+            Response text chunks as the server produces them (SSE)
+
+        Raises:
+            APIError: If API request fails
+        """
+        try:
+            logger.info(f"Streaming chat message: {message[:50]}...")
+            with self.session.stream("POST", "/chat/stream", json={"message": message}) as response:
+                response.raise_for_status()
+                data_lines = []
+                for line in response.iter_lines():
+                    if line.startswith("data: "):
+                        data_lines.append(line[6:])
+                    elif not line and data_lines:
+                        data = "\n".join(data_lines)
+                        data_lines = []
+                        if data == "[DONE]":
+                            return
+                        yield data
+
+        except httpx.ConnectError:
             raise APIError("Cannot connect to API server. Please start FastAPI first.")
-        except requests.exceptions.Timeout:
+        except httpx.TimeoutException:
             raise APIError("Chat request timed out. Please try again.")
         except Exception as e:
             raise APIError(f"Chat error: {str(e)}")
-    
+
     def get_all_songs(self) -> List[str]:
         """
         Get list of all available songs
-        
+
         Returns:
             List of song names
-            
+
         Raises:
             APIError: If API request fails
         """
         try:
             logger.info("Fetching all songs from API")
-            response = requests.get(
-                f"{self.base_url}/songs",
-                timeout=TIMEOUT
-            )
+            headers = {}
+            if self._songs_etag and self._songs_cache is not None:
+                headers["If-None-Match"] = self._songs_etag
+            response = self.session.get("/songs", headers=headers)
+
+            if response.status_code == 304:
+                logger.info("Song list unchanged (304), using cached copy")
+                return self._songs_cache
+
             response.raise_for_status()
-            result = response.json()
+            # orjson: the songs payload is large, decode it with the fast path
+            result = orjson.loads(response.content)
             songs = result.get("songs", [])
+            self._songs_etag = response.headers.get("etag")
+            self._songs_cache = songs
+            if self._songs_etag:
+                self._save_songs_cache()
             logger.info(f"Received {len(songs)} songs")
             return songs
-            
-        except requests.exceptions.ConnectionError:
+
+        except httpx.ConnectError:
             raise APIError("Cannot connect to API server. Please start FastAPI first.")
-        except requests.exceptions.Timeout:
+        except httpx.TimeoutException:
             raise APIError("Request timed out while fetching songs.")
         except Exception as e:
             raise APIError(f"Error fetching songs: {str(e)}")
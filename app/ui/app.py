@@ -7,21 +7,129 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
+import functools
+import httpx
 import pandas as pd
 import sys
 import os
-import textwrap
-import re
 
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
 
 from app.ui.api_client import api_client, APIError
 
-# Load external CSS
-css_file = os.path.join(os.path.dirname(__file__), "style.css")
-if os.path.exists(css_file):
+@functools.lru_cache(maxsize=256)
+def format_assistant(content: str) -> str:
+    """Format an assistant message as HTML in a single linear scan.
+
+    Handles **bold**, __bold__, *italic*, _italic_ and newlines inline,
+    replacing the old stack of regex passes. Cached so unchanged messages
+    cost nothing on Streamlit reruns.
+    """
+    parts = []
+    in_bold = in_italic = False
+    i = start = 0
+    n = len(content)
+    while i < n:
+        ch = content[i]
+        if ch == '*' or ch == '_':
+            if start < i:
+                parts.append(content[start:i])
+            if i + 1 < n and content[i + 1] == ch:
+                parts.append('</strong>' if in_bold else '<strong>')
+                in_bold = not in_bold
+                i += 2
+            else:
+                parts.append('</em>' if in_italic else '<em>')
+                in_italic = not in_italic
+                i += 1
+            start = i
+        elif ch == '\n':
+            if start < i:
+                parts.append(content[start:i])
+            parts.append('<br>')
+            i += 1
+            start = i
+        else:
+            i += 1
+    if start < n:
+        parts.append(content[start:])
+    # Close any unbalanced delimiters so the HTML stays well-formed
+    if in_italic:
+        parts.append('</em>')
+    if in_bold:
+        parts.append('</strong>')
+    return ''.join(parts)
+
+# Pre-dedented chat HTML templates (the whole history is rebuilt on every rerun)
+_WELCOME_HTML = (
+    '<div class="message-wrapper assistant">'
+    '<div class="avatar assistant">🎵</div>'
+    '<div class="modern-message assistant">'
+    "👋 Hi! I'm your Music Assistant powered by AI. Ask me for song recommendations!"
+    '</div>'
+    '</div>'
+)
+_USER_TEMPLATE = (
+    '<div class="message-wrapper user">'
+    '<div class="modern-message user">{content}</div>'
+    '<div class="avatar user">👤</div>'
+    '</div>'
+)
+_ASSISTANT_TEMPLATE = (
+    '<div class="message-wrapper assistant">'
+    '<div class="avatar assistant">🎵</div>'
+    '<div class="modern-message assistant">{content}</div>'
+    '</div>'
+)
+# Auto-scroll trigger (hidden image onerror hack, more reliable in st.markdown)
+_SCROLL_HTML = (
+    '</div>'
+    '<img src="x" style="display:none" onerror="'
+    "var container = document.querySelector('.chat-container');"
+    'if (container) { container.scrollTop = container.scrollHeight; }'
+    '">'
+)
+
+@st.cache_data(show_spinner=False, max_entries=512)
+def render_message(role: str, content: str) -> str:
+    """Render one chat message to its bubble HTML, memoized per message.
+
+    Streamlit reruns the whole script each turn; with this cache only the
+    newest message pays formatting cost, keeping redraw work constant as
+    the history grows.
+    """
+    if role == "user":
+        return _USER_TEMPLATE.format(content=content)
+    return _ASSISTANT_TEMPLATE.format(content=format_assistant(content))
+
+@st.cache_data(ttl=3600, show_spinner=False)
+def load_song_list():
+    """Fetch the song list once per hour, shared across sessions."""
+    return api_client.get_all_songs()
+
+# Load external CSS (read once per process; Streamlit reruns this script constantly)
+@st.cache_resource
+def _load_css() -> str:
+    css_file = os.path.join(os.path.dirname(__file__), "style.css")
+    if not os.path.exists(css_file):
+        return ""
     with open(css_file) as f:
-        st.markdown(f"<style>{f.read()}</style>", unsafe_allow_html=True)
+        return f"<style>{f.read()}</style>"
+
+@st.cache_data(show_spinner=False)
+def _load_sidebar_icon(url: str) -> bytes:
+    """Download the sidebar icon once and re-serve the bytes.
+
+    Raises on failure so st.cache_data only ever caches a successful
+    download; the call site falls back to the plain URL.
+    """
+    response = httpx.get(url, timeout=5)
+    response.raise_for_status()
+    return response.content
+
+_css = _load_css()
+if _css:
+    st.markdown(_css, unsafe_allow_html=True)
 else:
     st.error("CSS file not found!")
 
@@ -56,7 +164,12 @@ if not st.session_state.api_connected:
 
 # Sidebar
 with st.sidebar:
-    st.image("https://cdn-icons-png.flaticon.com/512/3043/3043665.png", width=100)
+    _icon_url = "https://cdn-icons-png.flaticon.com/512/3043/3043665.png"
+    try:
+        _icon = _load_sidebar_icon(_icon_url)
+    except Exception:
+        _icon = _icon_url  # let the browser fetch it; retried next rerun
+    st.image(_icon, width=100)
     st.markdown("## Navigation")
     mode = st.radio("Choose Mode", ["🎵 Recommendation", "🤖 AI Assistant"])
     
@@ -87,17 +200,16 @@ if mode == "🎵 Recommendation":
     with col1:
         st.subheader("Select a Song")
         
-        # Load songs from API
-        if 'song_list' not in st.session_state:
-            try:
-                with st.spinner("Loading songs..."):
-                    st.session_state.song_list = api_client.get_all_songs()
-            except APIError as e:
-                st.error(f"Error loading songs: {e}")
-                st.session_state.song_list = []
-        
-        if st.session_state.song_list:
-            selected_song = st.selectbox("Search your favorite track", st.session_state.song_list)
+        # Load songs from API (cached across sessions in this process)
+        try:
+            with st.spinner("Loading songs..."):
+                song_list = load_song_list()
+        except APIError as e:
+            st.error(f"Error loading songs: {e}")
+            song_list = []
+
+        if song_list:
+            selected_song = st.selectbox("Search your favorite track", song_list)
             
             if st.button("Get Recommendations"):
                 if selected_song:
@@ -119,14 +231,15 @@ if mode == "🎵 Recommendation":
         if 'recommendations' in st.session_state and st.session_state.recommendations is not None:
             st.subheader("Recommended Tracks")
             rec_df = st.session_state.recommendations
-            
-            for index, row in rec_df.iterrows():
-                st.markdown(f"""
-                    <div class="song-card">
-                        <div class="song-title">🎶 {row['song']}</div>
-                        <div class="song-artist">🎤 {row['artist']}</div>
-                    </div>
-                """, unsafe_allow_html=True)
+
+            # Build all cards in one vectorized pandas pass and emit a single markdown call
+            cards_html = (
+                '<div class="song-card">'
+                '<div class="song-title">🎶 ' + rec_df['song'].astype(str) + '</div>'
+                '<div class="song-artist">🎤 ' + rec_df['artist'].astype(str) + '</div>'
+                '</div>'
+            ).str.cat(sep='')
+            st.markdown(cards_html, unsafe_allow_html=True)
         elif 'recommendations' in st.session_state and st.session_state.recommendations is None:
             st.warning("Song not found in dataset")
         else:
@@ -140,59 +253,19 @@ elif mode == "🤖 AI Assistant":
         # Create a container for chat messages with fixed height
         # Chat container UI (CSS handled by style.css)
         
-        # Chat messages container
-        chat_html = '<div class="chat-container">'
-        
+        # Chat messages container (list-append + join keeps concatenation linear)
+        parts = ['<div class="chat-container">']
+
         if not st.session_state.chat_history:
             # Welcome message when chat is empty
-            chat_html += textwrap.dedent('''
-                <div class="message-wrapper assistant">
-                    <div class="avatar assistant">🎵</div>
-                    <div class="modern-message assistant">
-                        👋 Hi! I'm your Music Assistant powered by AI. Ask me for song recommendations!
-                    </div>
-                </div>
-            ''')
+            parts.append(_WELCOME_HTML)
         else:
-            # Display chat history
+            # Display chat history (each message's HTML is memoized)
             for message in st.session_state.chat_history:
-                role = message["role"]
-                content = message["content"]
-                
-                if role == "user":
-                    chat_html += textwrap.dedent(f'''
-                        <div class="message-wrapper user">
-                            <div class="modern-message user">{content}</div>
-                            <div class="avatar user">👤</div>
-                        </div>
-                    ''')
-                else:
-                    # Format assistant message
-                    # Replace newlines with <br> and handle potential markdown simple cases
-                    formatted_content = content.replace('\n', '<br>')
-                    # Handle bold (**text** or __text__)
-                    formatted_content = re.sub(r'\*\*(.*?)\*\*', r'<strong>\1</strong>', formatted_content)
-                    formatted_content = re.sub(r'__(.*?)__', r'<strong>\1</strong>', formatted_content)
-                    # Handle italic (*text* or _text_)
-                    formatted_content = re.sub(r'\*(.*?)\*', r'<em>\1</em>', formatted_content)
-                    formatted_content = re.sub(r'_(.*?)_', r'<em>\1</em>', formatted_content)
-                    
-                    chat_html += textwrap.dedent(f'''
-                        <div class="message-wrapper assistant">
-                            <div class="avatar assistant">🎵</div>
-                            <div class="modern-message assistant">{formatted_content}</div>
-                        </div>
-                    ''')
-        
-        # Add auto-scroll trigger (using a hidden image onerror hack as it's more reliable in st.markdown)
-        chat_html += textwrap.dedent('''
-            </div>
-            <img src="x" style="display:none" onerror="
-                var container = document.querySelector('.chat-container');
-                if (container) { container.scrollTop = container.scrollHeight; }
-            ">
-        ''')
-        st.markdown(chat_html, unsafe_allow_html=True)
+                parts.append(render_message(message["role"], message["content"]))
+
+        parts.append(_SCROLL_HTML)
+        st.markdown(''.join(parts), unsafe_allow_html=True)
         
         # Beautiful input field with custom styling
         prompt = st.chat_input(
@@ -204,11 +277,10 @@ elif mode == "🤖 AI Assistant":
             # Add user message
             st.session_state.chat_history.append({"role": "user", "content": prompt})
             
-            # Get bot response from API
+            # Stream bot response from API so tokens appear as they arrive
             try:
-                with st.spinner("🎵 Thinking..."):
-                    response = api_client.chat_with_assistant(prompt)
-                
+                response = st.write_stream(api_client.stream_chat(prompt))
+
                 # Add bot message
                 st.session_state.chat_history.append({"role": "assistant", "content": response})
                 st.rerun()